@@ -6,21 +6,79 @@ Handles user login, session management, and path storage
 import sqlite3
 import hashlib
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 import secrets
 
+
+# SQL for the hot paths, built once so sqlite3's statement cache always sees
+# the identical string object (DDL stays inline in init_db; it runs once)
+SQL_SELECT_USER_BY_NAME = 'SELECT id, password_hash FROM users WHERE username = ?'
+SQL_INSERT_SESSION = 'INSERT INTO sessions (user_id, token, expires_at) VALUES (?, ?, ?)'
+SQL_VERIFY_SESSION = 'SELECT user_id FROM sessions WHERE token = ? AND expires_at > datetime("now")'
+SQL_DELETE_SESSION = 'DELETE FROM sessions WHERE token = ?'
+SQL_INSERT_DOWNLOAD = '''
+    INSERT INTO downloads (user_id, title, source, url, manga_id, cover_url, temp_path, destination, status, progress, error)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_SELECT_DOWNLOADS = 'SELECT * FROM downloads WHERE user_id = ? ORDER BY added_at DESC'
+SQL_SELECT_DOWNLOAD = 'SELECT * FROM downloads WHERE id = ? AND user_id = ?'
+SQL_DELETE_DOWNLOAD = 'DELETE FROM downloads WHERE id = ? AND user_id = ?'
+SQL_UPSERT_MANGA = '''
+    INSERT INTO manga_library (user_id, library_name, title, full_path, cover_url, file_count, last_scanned)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id, full_path) DO UPDATE SET
+        library_name = excluded.library_name,
+        title = excluded.title,
+        cover_url = excluded.cover_url,
+        file_count = excluded.file_count,
+        last_scanned = CURRENT_TIMESTAMP
+'''
+SQL_SELECT_MANGA = '''
+    SELECT library_name, title, full_path, cover_url, file_count
+    FROM manga_library
+    WHERE user_id = ?
+    ORDER BY library_name, title
+'''
+SQL_DELETE_MANGA_ENTRY = 'DELETE FROM manga_library WHERE user_id = ? AND full_path = ?'
+SQL_SELECT_MANGA_PATHS = 'SELECT full_path FROM manga_library WHERE user_id = ?'
+
 class AuthDB:
     """Handle user authentication and path management"""
-    
+
+    # In-process session cache so every authenticated request doesn't hit
+    # SQLite. Entries expire after a short TTL; logout drops them at once.
+    _SESSION_CACHE_TTL = 60  # seconds
+    _SESSION_CACHE_MAX = 10000
+
     def __init__(self, db_path='config/nukedown.db'):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._local = threading.local()
+        self._session_cache = {}
+        self._session_cache_lock = threading.Lock()
         self.init_db()
-    
+
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """Get this thread's reusable database connection"""
+        # One persistent connection per thread keeps SQLite's page cache and
+        # compiled-statement cache warm across requests instead of paying
+        # open/pragma/close on every query
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            # WAL lets concurrent readers proceed alongside a writer, which
+            # keeps the cover endpoint and the library scan from blocking
+            # each other; synchronous=NORMAL is safe under WAL and skips
+            # most fsyncs
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA cache_size=-64000')
+            conn.execute('PRAGMA mmap_size=268435456')
+            self._local.conn = conn
         return conn
     
     def init_db(self):
@@ -121,27 +179,52 @@ class AuthDB:
             conn.commit()
             print(f"Created default user: {default_username}")
         
-        conn.close()
     
-    @staticmethod
-    def _hash_password(password):
-        """Hash password using SHA256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+    # scrypt cost parameters: ~100ms per hash, paid only at login and
+    # password changes, never on the per-request session path
+    _SCRYPT_N = 2 ** 14
+    _SCRYPT_R = 8
+    _SCRYPT_P = 1
+
+    @classmethod
+    def _hash_password(cls, password):
+        """Hash a password with salted scrypt, stored as scrypt$salt$hash"""
+        salt = secrets.token_bytes(16)
+        digest = hashlib.scrypt(password.encode(), salt=salt,
+                                n=cls._SCRYPT_N, r=cls._SCRYPT_R, p=cls._SCRYPT_P)
+        return f'scrypt${salt.hex()}${digest.hex()}'
+
+    @classmethod
+    def _verify_password(cls, password, stored):
+        """Check a password against a stored hash; accepts legacy unsalted
+        SHA256 values so pre-migration users can still log in"""
+        if stored.startswith('scrypt$'):
+            try:
+                _, salt_hex, digest_hex = stored.split('$')
+            except ValueError:
+                return False
+            digest = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt_hex),
+                                    n=cls._SCRYPT_N, r=cls._SCRYPT_R, p=cls._SCRYPT_P)
+            return secrets.compare_digest(digest.hex(), digest_hex)
+        return secrets.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
     
     def authenticate_user(self, username, password):
         """Authenticate user and return user_id if successful"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        password_hash = self._hash_password(password)
-        cursor.execute(
-            'SELECT id FROM users WHERE username = ? AND password_hash = ?',
-            (username, password_hash)
-        )
+        cursor.execute(SQL_SELECT_USER_BY_NAME, (username,))
         result = cursor.fetchone()
-        conn.close()
-        
-        return result['id'] if result else None
+        if not result or not self._verify_password(password, result['password_hash']):
+            return None
+
+        # Upgrade legacy SHA256 hashes the next time the password is seen
+        if not result['password_hash'].startswith('scrypt$'):
+            cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                           (self._hash_password(password), result['id']))
+            conn.commit()
+
+        return result['id']
     
     def create_session(self, user_id, expires_in_hours=720):
         """Create session token for user (default 30 days)"""
@@ -151,36 +234,50 @@ class AuthDB:
         token = secrets.token_urlsafe(32)
         expires_at = datetime.now() + timedelta(hours=expires_in_hours)
         
-        cursor.execute(
-            'INSERT INTO sessions (user_id, token, expires_at) VALUES (?, ?, ?)',
-            (user_id, token, expires_at)
-        )
+        cursor.execute(SQL_INSERT_SESSION, (user_id, token, expires_at))
         conn.commit()
-        conn.close()
         
         return token
     
+    @staticmethod
+    def _token_fingerprint(token):
+        """Compact cache key for a session token (blake2b is the fastest
+        stdlib hash on 64-bit CPUs); keeps raw tokens out of the cache"""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
     def verify_session(self, token):
-        """Verify session token and return user_id"""
+        """Verify session token and return user_id, consulting the
+        in-process cache before SQLite"""
+        now = time.monotonic()
+        key = self._token_fingerprint(token)
+        with self._session_cache_lock:
+            cached = self._session_cache.get(key)
+            if cached and now - cached[1] < self._SESSION_CACHE_TTL:
+                return cached[0]
+
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute(
-            'SELECT user_id FROM sessions WHERE token = ? AND expires_at > datetime("now")',
-            (token,)
-        )
+        cursor.execute(SQL_VERIFY_SESSION, (token,))
         result = cursor.fetchone()
-        conn.close()
         
-        return result['user_id'] if result else None
+        user_id = result['user_id'] if result else None
+        if user_id:
+            with self._session_cache_lock:
+                if len(self._session_cache) >= self._SESSION_CACHE_MAX:
+                    self._session_cache.clear()
+                self._session_cache[key] = (user_id, now)
+        return user_id
     
     def invalidate_session(self, token):
         """Invalidate session token"""
+        with self._session_cache_lock:
+            self._session_cache.pop(self._token_fingerprint(token), None)
+
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM sessions WHERE token = ?', (token,))
+        cursor.execute(SQL_DELETE_SESSION, (token,))
         conn.commit()
-        conn.close()
     
     def save_path_config(self, user_id, path_name, download_path, media_path):
         """Save or update user's path configuration"""
@@ -209,7 +306,6 @@ class AuthDB:
             )
         
         conn.commit()
-        conn.close()
     
     def get_user_paths(self, user_id):
         """Get all path configurations for user"""
@@ -221,7 +317,6 @@ class AuthDB:
             (user_id,)
         )
         results = cursor.fetchall()
-        conn.close()
         
         return [dict(row) for row in results]
     
@@ -235,7 +330,6 @@ class AuthDB:
             (user_id, path_name)
         )
         result = cursor.fetchone()
-        conn.close()
         
         return dict(result) if result else None
     
@@ -248,7 +342,6 @@ class AuthDB:
             (user_id, path_name)
         )
         conn.commit()
-        conn.close()
     
     def create_user(self, username, password):
         """Create new user (admin only)"""
@@ -266,27 +359,22 @@ class AuthDB:
             return True
         except sqlite3.IntegrityError:
             return False
-        finally:
-            conn.close()
-    
+
     def change_password(self, user_id, old_password, new_password):
         """Change user password"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         # Verify old password
-        old_hash = self._hash_password(old_password)
-        cursor.execute('SELECT id FROM users WHERE id = ? AND password_hash = ?', (user_id, old_hash))
-        
-        if not cursor.fetchone():
-            conn.close()
+        cursor.execute('SELECT password_hash FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
+        if not row or not self._verify_password(old_password, row['password_hash']):
             return False
         
         # Update to new password
         new_hash = self._hash_password(new_password)
         cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user_id))
         conn.commit()
-        conn.close()
         
         return True
     
@@ -305,7 +393,6 @@ class AuthDB:
             (user_id, '__download_path__', download_path, '')
         )
         conn.commit()
-        conn.close()
     
     def get_download_path(self, user_id):
         """Get the global download path for user"""
@@ -317,7 +404,6 @@ class AuthDB:
             (user_id, '__download_path__')
         )
         result = cursor.fetchone()
-        conn.close()
         
         path = result['download_path'] if result else None
         # Normalize the path to use correct separators for current OS
@@ -333,7 +419,6 @@ class AuthDB:
             (user_id, '__download_path__')
         )
         conn.commit()
-        conn.close()
     
     def save_media_path(self, user_id, path_name, media_path):
         """Save media path for user"""
@@ -349,7 +434,6 @@ class AuthDB:
             (user_id, path_name, '', media_path)
         )
         conn.commit()
-        conn.close()
     
     def get_media_paths(self, user_id):
         """Get all media paths for user"""
@@ -361,7 +445,6 @@ class AuthDB:
             (user_id, '__download_path__')
         )
         results = cursor.fetchall()
-        conn.close()
         
         # Normalize paths to use correct separators for current OS
         return [{'path_name': row['path_name'], 'media_path': os.path.normpath(row['media_path'])} for row in results]
@@ -370,7 +453,7 @@ class AuthDB:
         """Delete media path for user"""
         if path_name == '__download_path__':
             return False  # Don't allow deleting the special download path entry
-        
+
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute(
@@ -378,8 +461,25 @@ class AuthDB:
             (user_id, path_name)
         )
         conn.commit()
-        conn.close()
         return True
+
+    def delete_media_paths_bulk(self, user_id, path_names):
+        """Delete multiple media paths for user in a single statement"""
+        path_names = [n for n in path_names if n != '__download_path__']
+        if not path_names:
+            return 0
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' * len(path_names))
+        cursor.execute(
+            f'DELETE FROM user_paths WHERE user_id = ? AND path_name IN ({placeholders})',
+            (user_id, *path_names)
+        )
+        deleted_count = cursor.rowcount
+        conn.commit()
+
+        return deleted_count
     
     # Downloads management methods
     def add_download(self, user_id, download_data):
@@ -387,10 +487,7 @@ class AuthDB:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO downloads (user_id, title, source, url, manga_id, cover_url, temp_path, destination, status, progress, error)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        cursor.execute(SQL_INSERT_DOWNLOAD, (
             user_id,
             download_data.get('title', ''),
             download_data.get('source', 'unknown'),
@@ -406,7 +503,6 @@ class AuthDB:
         
         download_id = cursor.lastrowid
         conn.commit()
-        conn.close()
         
         return download_id
     
@@ -415,12 +511,21 @@ class AuthDB:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM downloads WHERE user_id = ? ORDER BY added_at DESC', (user_id,))
+        cursor.execute(SQL_SELECT_DOWNLOADS, (user_id,))
         downloads = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         
         return downloads
-    
+
+    def get_download(self, download_id, user_id):
+        """Get a single download for user"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(SQL_SELECT_DOWNLOAD, (download_id, user_id))
+        row = cursor.fetchone()
+
+        return dict(row) if row else None
+
     def update_download(self, download_id, user_id, update_data):
         """Update download for user"""
         conn = self.get_connection()
@@ -436,7 +541,6 @@ class AuthDB:
                 values.append(value)
         
         if not set_parts:
-            conn.close()
             return False
         
         query = f'UPDATE downloads SET {", ".join(set_parts)} WHERE id = ? AND user_id = ?'
@@ -445,7 +549,6 @@ class AuthDB:
         cursor.execute(query, values)
         updated = cursor.rowcount > 0
         conn.commit()
-        conn.close()
         
         return updated
     
@@ -454,10 +557,9 @@ class AuthDB:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('DELETE FROM downloads WHERE id = ? AND user_id = ?', (download_id, user_id))
+        cursor.execute(SQL_DELETE_DOWNLOAD, (download_id, user_id))
         deleted = cursor.rowcount > 0
         conn.commit()
-        conn.close()
         
         return deleted
     
@@ -477,7 +579,6 @@ class AuthDB:
         ''', (user_id,))
         
         stats = dict(cursor.fetchone())
-        conn.close()
         
         return stats
     
@@ -486,31 +587,29 @@ class AuthDB:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO manga_library (user_id, library_name, title, full_path, cover_url, file_count, last_scanned)
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(user_id, full_path) DO UPDATE SET
-                library_name = excluded.library_name,
-                title = excluded.title,
-                cover_url = excluded.cover_url,
-                file_count = excluded.file_count,
-                last_scanned = CURRENT_TIMESTAMP
-        ''', (user_id, library_name, title, full_path, cover_url, file_count))
+        cursor.execute(SQL_UPSERT_MANGA, (user_id, library_name, title, full_path, cover_url, file_count))
         
         conn.commit()
-        conn.close()
     
+    def save_manga_entries_bulk(self, entries):
+        """Save or update many manga entries in one transaction
+
+        entries: list of (user_id, library_name, title, full_path, cover_url, file_count)
+        """
+        if not entries:
+            return
+
+        conn = self.get_connection()
+        conn.executemany(SQL_UPSERT_MANGA, entries)
+
+        conn.commit()
+
     def get_manga_library(self, user_id):
         """Get all manga entries for user grouped by library"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT library_name, title, full_path, cover_url, file_count
-            FROM manga_library
-            WHERE user_id = ?
-            ORDER BY library_name, title
-        ''', (user_id,))
+        cursor.execute(SQL_SELECT_MANGA, (user_id,))
         
         libraries = {}
         for row in cursor.fetchall():
@@ -525,30 +624,44 @@ class AuthDB:
                 'file_count': row['file_count']
             })
         
-        conn.close()
         return libraries
     
     def delete_manga_entry(self, user_id, full_path):
         """Delete manga entry from library"""
-        import os
         normalized_path = os.path.normpath(full_path)
         
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('DELETE FROM manga_library WHERE user_id = ? AND full_path = ?', (user_id, normalized_path))
+        cursor.execute(SQL_DELETE_MANGA_ENTRY, (user_id, normalized_path))
         deleted = cursor.rowcount > 0
         
         # Also try with the original path in case normalization differs
         if not deleted:
-            cursor.execute('DELETE FROM manga_library WHERE user_id = ? AND full_path = ?', (user_id, full_path))
+            cursor.execute(SQL_DELETE_MANGA_ENTRY, (user_id, full_path))
             deleted = cursor.rowcount > 0
         
         conn.commit()
-        conn.close()
         
         return deleted
     
+    def delete_manga_entries_bulk(self, user_id, full_paths):
+        """Delete multiple manga entries in a single statement"""
+        if not full_paths:
+            return 0
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' * len(full_paths))
+        cursor.execute(
+            f'DELETE FROM manga_library WHERE user_id = ? AND full_path IN ({placeholders})',
+            (user_id, *full_paths)
+        )
+        deleted_count = cursor.rowcount
+        conn.commit()
+
+        return deleted_count
+
     def delete_all_manga_entries(self, user_id):
         """Delete all manga entries for user"""
         conn = self.get_connection()
@@ -557,7 +670,6 @@ class AuthDB:
         cursor.execute('DELETE FROM manga_library WHERE user_id = ?', (user_id,))
         deleted_count = cursor.rowcount
         conn.commit()
-        conn.close()
         
         return deleted_count
     
@@ -573,7 +685,6 @@ class AuthDB:
         cursor.execute('DELETE FROM manga_library WHERE user_id = ? AND full_path LIKE ?', (user_id, f"{normalized_library_path}/%"))
         deleted_count = cursor.rowcount
         conn.commit()
-        conn.close()
         
         return deleted_count
     
@@ -582,8 +693,7 @@ class AuthDB:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT full_path FROM manga_library WHERE user_id = ?', (user_id,))
+        cursor.execute(SQL_SELECT_MANGA_PATHS, (user_id,))
         rows = cursor.fetchall()
-        conn.close()
         
         return [row[0] for row in rows]
@@ -1,27 +1,22 @@
-import hashlib
 import sqlite3
 
-def hash_password(password):
-    """Hash password using SHA256 (same as auth.py)"""
-    return hashlib.sha256(password.encode()).hexdigest()
+from auth import AuthDB
 
 def check_password(username, password):
     """Check if password matches for user"""
-    hashed = hash_password(password)
-
     conn = sqlite3.connect('config/nukedown.db')
     c = conn.cursor()
     c.execute('SELECT password_hash FROM users WHERE username = ?', (username,))
     result = c.fetchone()
     conn.close()
 
-    if result and result[0] == hashed:
+    if result and AuthDB._verify_password(password, result[0]):
         return True
     return False
 
 def reset_password(username, new_password):
     """Reset password for user"""
-    hashed = hash_password(new_password)
+    hashed = AuthDB._hash_password(new_password)
 
     conn = sqlite3.connect('config/nukedown.db')
     c = conn.cursor()
@@ -47,4 +42,4 @@ for user in users:
 
 print("\nTo reset a password, uncomment and modify these lines:")
 print("# reset_password('root', 'newpassword')")
-print("# reset_password('testuser', 'newpassword')")
\ No newline at end of file
+print("# reset_password('testuser', 'newpassword')")
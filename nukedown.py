@@ -5,15 +5,21 @@ A Jellyseerr-like interface for requesting manga downloads
 Now using direct manga site integration for better results
 """
 
-from asyncio.log import logger
+import ctypes
+import logging
 import os
+import re
+import stat
+import string
 import subprocess
 import json
 import requests
+import time
 import xml.etree.ElementTree as ET
 import sqlite3
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, jsonify, Response
+from flask import Flask, render_template, request, redirect, url_for, jsonify, Response, send_file, send_from_directory
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache, wraps
 import hashlib
 import threading
@@ -21,9 +27,16 @@ import shutil
 import urllib.parse
 import yt_dlp
 
+try:
+    import orjson
+except ImportError:  # optional speedup; jsonify is used when absent
+    orjson = None
+
 # Import authentication module
 from auth import AuthDB
 
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__, template_folder='templates')
 auth_db = AuthDB('config/nukedown.db')
 
@@ -37,37 +50,71 @@ path_aliases = {}
 # YouTube downloads tracking
 youtube_downloads = []
 
+# Cancellation signals for in-flight downloads, keyed by database download id.
+# The DB row is still updated for persistence, but the hot path in the
+# progress hook only touches this Event.
+_cancel_events = {}
+_cancel_events_lock = threading.Lock()
+
+# Precompiled once - normalize_title runs for every result during dedup
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+# Timestamp strings for download entries only need second resolution, so
+# cache the formatted value instead of allocating datetimes on every write
+_ts_cache = [0.0, '']
+
+def _now_iso():
+    """Current local time as an ISO string, cached at 1-second granularity"""
+    t = time.time()
+    if t - _ts_cache[0] >= 1.0:
+        _ts_cache[0] = t
+        _ts_cache[1] = datetime.now().isoformat()
+    return _ts_cache[1]
+
+def _move_fast(src, dst):
+    """Move a file, using a plain rename when source and destination share a
+    filesystem (no bytes copied); falls back to shutil.move across devices"""
+    try:
+        os.rename(src, dst)
+    except OSError:
+        shutil.move(src, dst)
+
 def normalize_title(title):
     """Normalize title for deduplication"""
-    import re
     # Remove special characters, convert to lowercase, strip whitespace
-    normalized = re.sub(r'[^\w\s]', '', title.lower()).strip()
+    normalized = _PUNCT_RE.sub('', title.lower()).strip()
     # Remove common words that don't affect uniqueness
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-    words = [w for w in normalized.split() if w not in stop_words]
+    words = [w for w in normalized.split() if w not in _STOP_WORDS]
     return ' '.join(words)
 
 # ============================================================================
 # AUTHENTICATION ROUTES
 # ============================================================================
 
+def _extract_bearer(auth_header):
+    """Pull the token out of a 'Bearer <token>' Authorization header"""
+    if not auth_header:
+        return None
+    scheme, _, token = auth_header.partition(' ')
+    return token if scheme.lower() == 'bearer' and token else None
+
 def token_required(f):
     """Decorator to require valid auth token for API routes"""
     @wraps(f)
     def decorated(*args, **kwargs):
         token = None
-        
+
         # Check for token in Authorization header
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(' ')[1]
-            except IndexError:
+        auth_header = request.headers.get('Authorization')
+        if auth_header:
+            token = _extract_bearer(auth_header)
+            if not token:
                 return jsonify({'message': 'Invalid token format'}), 401
-        
+
         if not token:
             return jsonify({'message': 'Token required'}), 401
-        
+
         user_id = auth_db.verify_session(token)
         if not user_id:
             return jsonify({'message': 'Invalid or expired token'}), 401
@@ -87,13 +134,9 @@ def login_required(f):
         token = request.cookies.get('auth_token')
         
         # Also check Authorization header as fallback
-        if not token and 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(' ')[1]
-            except IndexError:
-                pass
-        
+        if not token:
+            token = _extract_bearer(request.headers.get('Authorization'))
+
         if not token:
             return redirect(url_for('login_page'))
         
@@ -194,6 +237,8 @@ def save_media_path():
     
     os.makedirs(os.path.normpath(media_path), exist_ok=True)
     auth_db.save_media_path(request.user_id, path_name, media_path)
+    _invalidate_library_map(request.user_id)
+    _invalidate_library_response(request.user_id)
     return jsonify({'message': 'Media path saved successfully'}), 200
 
 @app.route('/api/auth/media-paths', methods=['GET'])
@@ -202,17 +247,21 @@ def get_media_paths():
     """Get all media paths for current user"""
     paths = auth_db.get_media_paths(request.user_id)
     
-    # Filter out paths that don't exist and clean up database
+    # Filter out paths that don't exist and clean up database in one go
     valid_paths = []
+    stale_names = []
     for path_info in paths:
         media_path = path_info['media_path']
         if os.path.exists(media_path):
             valid_paths.append(path_info)
         else:
-            # Remove non-existent path from database
-            print(f"DEBUG: Removing non-existent media path from database: {media_path}")
-            auth_db.delete_media_path(request.user_id, path_info['path_name'])
-    
+            logger.debug("Removing non-existent media path from database: %s", media_path)
+            stale_names.append(path_info['path_name'])
+
+    if stale_names:
+        auth_db.delete_media_paths_bulk(request.user_id, stale_names)
+        _invalidate_library_map(request.user_id)
+
     return jsonify({'media_paths': valid_paths}), 200
 
 @app.route('/api/auth/media-path', methods=['DELETE'])
@@ -226,6 +275,8 @@ def delete_media_path():
         return jsonify({'message': 'Path name required'}), 400
     
     if auth_db.delete_media_path(request.user_id, path_name):
+        _invalidate_library_map(request.user_id)
+        _invalidate_library_response(request.user_id)
         return jsonify({'message': 'Media path deleted successfully'}), 200
     else:
         return jsonify({'message': 'Cannot delete this path'}), 400
@@ -249,20 +300,158 @@ def change_password():
     else:
         return jsonify({'message': 'Current password is incorrect'}), 400
 
+# Cached per-user library name -> media path maps so the cover hot path
+# does no DB work after warm-up.
+_LIBRARY_MAP_TTL = 30  # seconds
+_library_map_cache = {}
+_library_map_lock = threading.Lock()
+
+def _get_library_map(user_id):
+    """Get a {library_name: media_path} map for the user, cached briefly"""
+    now = time.monotonic()
+    with _library_map_lock:
+        cached = _library_map_cache.get(user_id)
+        if cached and now - cached[1] < _LIBRARY_MAP_TTL:
+            return cached[0]
+    library_map = {p['path_name']: p['media_path'] for p in auth_db.get_media_paths(user_id)}
+    with _library_map_lock:
+        _library_map_cache[user_id] = (library_map, now)
+    return library_map
+
+def _invalidate_library_map(user_id):
+    """Drop the cached library map after media paths change"""
+    with _library_map_lock:
+        _library_map_cache.pop(user_id, None)
+
+# Placeholder cover read once at import so the missing-cover path serves
+# straight from memory instead of erroring or touching the filesystem
+try:
+    with open(os.path.join(os.path.dirname(__file__), 'static', 'placeholder-cover.svg'), 'rb') as _f:
+        _PLACEHOLDER_COVER = _f.read()
+except OSError:
+    _PLACEHOLDER_COVER = b''
+
+def _placeholder_cover_response():
+    """Serve the in-memory placeholder; short max-age so a real cover that
+    appears later gets picked up"""
+    if not _PLACEHOLDER_COVER:
+        return jsonify({'message': 'Cover not found'}), 404
+    response = Response(_PLACEHOLDER_COVER, mimetype='image/svg+xml')
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
+
+@app.route('/api/libraries/cover/<path:relative_path>', methods=['GET'])
+def get_manga_cover(relative_path):
+    """Serve a cover image from a media library (token comes via query string
+    because <img> tags can't send an Authorization header)"""
+    token = request.args.get('token')
+    if not token:
+        return jsonify({'message': 'Token required'}), 401
+
+    user_id = auth_db.verify_session(token)
+    if not user_id:
+        return jsonify({'message': 'Invalid or expired token'}), 401
+
+    library_name = request.args.get('library')
+    media_path = _get_library_map(user_id).get(library_name)
+    if not media_path:
+        return jsonify({'message': 'Library not found'}), 404
+
+    # Security check: the resolved path must stay inside the library.
+    # commonpath handles the /foo/bar vs /foo/barbaz boundary that a plain
+    # startswith gets wrong, and realpath defeats symlink escapes.
+    real_media = os.path.realpath(media_path)
+    full_path = os.path.realpath(os.path.join(media_path, relative_path))
+    try:
+        if os.path.commonpath([full_path, real_media]) != real_media:
+            return jsonify({'message': 'Access denied'}), 403
+    except ValueError:
+        return jsonify({'message': 'Access denied'}), 403
+
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        return _placeholder_cover_response()
+    if not stat.S_ISREG(st.st_mode):
+        return _placeholder_cover_response()
+
+    ext = os.path.splitext(full_path)[1].lower()
+    mime_type = MIME_BY_EXT.get(ext, 'application/octet-stream')
+
+    # Cheap validator so repeat cover fetches become header-only 304s
+    etag = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+    response = send_file(full_path, mimetype=mime_type, conditional=True,
+                         etag=etag, last_modified=st.st_mtime, max_age=3600)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+def _fast_jsonify(payload):
+    """Serialize a response dict with orjson when available; the library
+    listing can run to thousands of entries and orjson encodes plain
+    dict/str/int payloads several times faster than stdlib json"""
+    if orjson is None:
+        return jsonify(payload)
+    return app.response_class(orjson.dumps(payload), mimetype='application/json')
+
+# Cached library responses keyed by a cheap mtime signature of the media
+# roots, so repeat requests skip the filesystem walk when nothing changed.
+_LIBRARY_RESPONSE_TTL = 30  # seconds
+_library_response_cache = {}
+_library_response_lock = threading.Lock()
+
+def _library_scan_signature(user_id):
+    """Cheap change signature for a user's libraries: mtime of each media root"""
+    signature = []
+    for path_info in auth_db.get_media_paths(user_id):
+        try:
+            signature.append((path_info['media_path'], os.stat(path_info['media_path']).st_mtime_ns))
+        except OSError:
+            continue
+    return tuple(signature)
+
+def _invalidate_library_response(user_id):
+    """Drop the cached library response after library contents change"""
+    with _library_response_lock:
+        _library_response_cache.pop(user_id, None)
+
+# Library scans run off the request path so responses come straight from the
+# database snapshot; debounced per user to avoid overlapping walks
+_SCAN_DEBOUNCE_SECONDS = 15
+_scan_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='library-scan')
+_scan_inflight = {}
+_scan_inflight_lock = threading.Lock()
+
 @app.route('/api/libraries/manga', methods=['GET'])
 @token_required
 def get_manga_library():
     """Get all manga from all media paths grouped by library"""
     try:
         # Get the auth token for cover URLs
-        auth_token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        
-        # First, scan and update the database with current file system state
-        _scan_and_update_manga_library(request.user_id, auth_token)
-        
+        auth_token = _extract_bearer(request.headers.get('Authorization')) or ''
+
+        # Serve the cached response while the media roots are unchanged
+        signature = _library_scan_signature(request.user_id)
+        now = time.monotonic()
+        force = request.args.get('force') == '1'
+        if not force:
+            with _library_response_lock:
+                cached = _library_response_cache.get(request.user_id)
+                if cached and cached[1] == signature and now - cached[2] < _LIBRARY_RESPONSE_TTL:
+                    return _fast_jsonify(cached[0]), 200
+
+        # Kick the filesystem scan to the background (debounced) and serve the
+        # database snapshot immediately; ?force=1 waits for a fresh scan
+        future = None
+        with _scan_inflight_lock:
+            if force or now - _scan_inflight.get(request.user_id, 0) > _SCAN_DEBOUNCE_SECONDS:
+                _scan_inflight[request.user_id] = now
+                future = _scan_executor.submit(_scan_and_update_manga_library, request.user_id, auth_token)
+        if force and future is not None:
+            future.result()
+
         # Then return from database
         libraries = auth_db.get_manga_library(request.user_id)
-        
+
         # Format response to match expected structure
         response_libraries = {}
         for library_name, manga_list in libraries.items():
@@ -270,92 +459,147 @@ def get_manga_library():
                 'path': '',  # We don't need this in the response anymore
                 'manga': manga_list
             }
-        
-        return jsonify({'libraries': response_libraries}), 200
+
+        response = {'libraries': response_libraries}
+        with _library_response_lock:
+            _library_response_cache[request.user_id] = (response, signature, now)
+
+        return _fast_jsonify(response), 200
     except Exception as e:
         return jsonify({'message': f'Error loading libraries: {str(e)}'}), 500
 
+# File extensions used by the library scan and delete paths; frozensets so
+# membership tests are O(1) on the scan's hottest inner loop
+MEDIA_FILE_EXTS = frozenset({'.cbz', '.cbr', '.pdf', '.epub', '.mp4', '.webm', '.m4v', '.m4a', '.avi', '.mov', '.wmv', '.flv', '.mkv', '.mp3', '.flac', '.wav', '.aac', '.ogg'})
+MANGA_FILE_EXTS = frozenset({'.cbz', '.cbr', '.pdf', '.epub'})
+IMAGE_FILE_EXTS = frozenset({'.jpg', '.jpeg', '.png', '.webp', '.gif'})
+COVER_FILE_NAMES = ('cover.jpg', 'cover.png', 'cover.jpeg', 'cover.webp', 'cover.gif')
+THUMBNAIL_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+MIME_BY_EXT = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+
+# Starting points offered by the directory browser on Unix
+BROWSE_ROOT_PATHS = ('/', '/home', '/usr', '/var', '/opt')
+
+def _iter_manga_dirs(media_path):
+    """Yield (dir_path, file_names) for a media root and its immediate
+    subdirectories without descending into chapter folders"""
+    try:
+        with os.scandir(media_path) as it:
+            entries = list(it)
+    except OSError:
+        return
+
+    yield media_path, [e.name for e in entries if e.is_file()]
+
+    for entry in entries:
+        if entry.is_dir():
+            try:
+                with os.scandir(entry.path) as it:
+                    files = [e.name for e in it if e.is_file()]
+            except OSError:
+                continue
+            yield entry.path, files
+
+def _scan_one_library(user_id, path_info, auth_token):
+    """Scan a single media path; returns (entries, found_manga_paths)"""
+    entries = []
+    found_manga_paths = set()
+
+    media_path = os.path.normpath(path_info['media_path'])
+    library_name = path_info['path_name']
+
+    # The query string is identical for every cover in this library
+    cover_qs = urllib.parse.urlencode({'library': library_name, 'token': auth_token})
+
+    if os.path.exists(media_path):
+        # Look at the media root and its top-level manga folders only,
+        # never descending into chapter folders
+        for root, files in _iter_manga_dirs(media_path):
+            # Check if this directory contains manga/video files
+            manga_files = [f for f in files if os.path.splitext(f)[1].lower() in MEDIA_FILE_EXTS]
+            if manga_files:
+                # This is a manga directory; paths from the scandir walk are
+                # already normalized because media_path was normalized once
+                manga_title = os.path.basename(root)
+                manga_path = root
+                found_manga_paths.add(manga_path)
+
+                # Try to find a cover image named "cover" or video thumbnail
+                cover_url = None
+                # Single lowering pass; lookups after this are O(1)
+                lower_map = {f.lower(): f for f in files}
+                cover_filename = None
+                # Look for exact cover files first (case-insensitive)
+                for cover_name in COVER_FILE_NAMES:
+                    if cover_name in lower_map:
+                        cover_filename = lower_map[cover_name]
+                        break
+                if cover_filename is None:
+                    # Look for YouTube thumbnail files
+                    title_prefix = manga_title.lower()[:20]
+                    cover_filename = next((original for lowered, original in lower_map.items()
+                                           if lowered.endswith(THUMBNAIL_EXTS) and
+                                           (lowered.startswith(title_prefix) or 'thumb' in lowered)), None)
+                if cover_filename is None:
+                    # Fallback to any image file
+                    cover_filename = next((original for lowered, original in lower_map.items()
+                                           if os.path.splitext(lowered)[1] in IMAGE_FILE_EXTS), None)
+
+                if cover_filename:
+                    cover_path = os.path.join(root, cover_filename)
+                    # Create a relative path that can be served - cover_path
+                    # always extends media_path, so slicing beats relpath;
+                    # ensure forward slashes for URLs
+                    relative_path = cover_path[len(media_path) + 1:].replace(os.sep, '/')
+                    cover_url = f"/api/libraries/cover/{urllib.parse.quote(relative_path, safe='/')}?{cover_qs}"
+                    logger.debug("Found cover for %s: %s -> %s", manga_title, cover_filename, cover_url)
+                elif logger.isEnabledFor(logging.DEBUG):
+                    # Guarded so the image-file list isn't built when debug is off
+                    logger.debug("No cover found for %s in %s. Files: %s", manga_title, root,
+                                 [f for f in files if os.path.splitext(f)[1].lower() in IMAGE_FILE_EXTS])
+
+                # Queue for a single bulk upsert after the walk
+                entries.append((user_id, library_name, manga_title, manga_path, cover_url, len(manga_files)))
+
+    return entries, found_manga_paths
+
 def _scan_and_update_manga_library(user_id, auth_token):
     """Scan file system and update manga library database"""
     try:
         media_paths = auth_db.get_media_paths(user_id)
-        
+
         # Track all found manga paths for cleanup
         found_manga_paths = set()
-        
-        for path_info in media_paths:
-            media_path = os.path.normpath(path_info['media_path'])
-            library_name = path_info['path_name']
-            
-            if not os.path.exists(media_path):
-                continue
-                
-            # Walk through the media path and find manga directories
-            for root, dirs, files in os.walk(media_path):
-                # Skip subdirectories that are too deep (avoid going into chapter folders)
-                depth = root.replace(media_path, '').count(os.sep)
-                if depth > 1:  # Only look at top-level manga folders
-                    continue
-                    
-                # Check if this directory contains manga/video files
-                manga_files = [f for f in files if f.lower().endswith(('.cbz', '.cbr', '.pdf', '.epub', '.mp4', '.webm', '.m4v', '.m4a', '.avi', '.mov', '.wmv', '.flv', '.mkv', '.mp3', '.m4a', '.flac', '.wav', '.aac', '.ogg'))]
-                if manga_files:
-                    # This is a manga directory
-                    manga_title = os.path.basename(root)
-                    manga_path = os.path.normpath(root)
-                    found_manga_paths.add(manga_path)
-                    
-                    # Try to find a cover image named "cover" or video thumbnail
-                    cover_url = None
-                    # Look for exact "cover.jpg" first, then other cover files (case-insensitive)
-                    files_lower = [f.lower() for f in files]
-                    cover_files = []
-                    if 'cover.jpg' in files_lower:
-                        cover_files = [files[files_lower.index('cover.jpg')]]
-                    elif 'cover.png' in files_lower:
-                        cover_files = [files[files_lower.index('cover.png')]]
-                    elif 'cover.jpeg' in files_lower:
-                        cover_files = [files[files_lower.index('cover.jpeg')]]
-                    elif 'cover.webp' in files_lower:
-                        cover_files = [files[files_lower.index('cover.webp')]]
-                    elif 'cover.gif' in files_lower:
-                        cover_files = [files[files_lower.index('cover.gif')]]
-                    else:
-                        # Look for YouTube thumbnail files
-                        thumbnail_files = [f for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')) and 
-                                         (f.lower().startswith(manga_title.lower()[:20]) or 'thumb' in f.lower() or 'thumbnail' in f.lower())]
-                        if thumbnail_files:
-                            cover_files = thumbnail_files[:1]  # Take first match
-                        else:
-                            # Fallback to any image file
-                            cover_files = [f for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png', '.webp', '.gif'))]
-                    
-                    if cover_files:
-                        # Use the cover file
-                        cover_filename = cover_files[0]
-                        cover_path = os.path.join(root, cover_filename)
-                        # Create a relative path that can be served - ensure forward slashes for URLs
-                        # Normalize both paths to ensure consistent separators
-                        media_path_normalized = os.path.normpath(media_path)
-                        cover_path_normalized = os.path.normpath(cover_path)
-                        relative_path = os.path.relpath(cover_path_normalized, media_path_normalized).replace('\\', '/')
-                        cover_url = f'/api/libraries/cover/{urllib.parse.quote(relative_path)}?library={library_name}&token={auth_token}'
-                        print(f"DEBUG: Found cover for {manga_title}: {cover_filename} -> {cover_url}")
-                    else:
-                        print(f"DEBUG: No cover found for {manga_title} in {root}. Files: {[f for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png', '.webp', '.gif'))]}")
-                    
-                    # Save/update in database
-                    auth_db.save_manga_entry(user_id, library_name, manga_title, manga_path, cover_url, len(manga_files))
-        
+
+        # Accumulate rows so the whole scan commits as one transaction
+        entries = []
+
+        if media_paths:
+            # Libraries on different disks scan independently; fan out one
+            # worker per media path and merge the results
+            with ThreadPoolExecutor(max_workers=min(8, len(media_paths))) as executor:
+                results = executor.map(lambda p: _scan_one_library(user_id, p, auth_token), media_paths)
+                for library_entries, library_found in results:
+                    entries.extend(library_entries)
+                    found_manga_paths |= library_found
+
+        auth_db.save_manga_entries_bulk(entries)
+
         # Clean up: remove database entries for manga that no longer exist
         all_db_entries = auth_db.get_all_manga_paths(user_id)
-        for db_entry in all_db_entries:
-            if db_entry not in found_manga_paths:
-                print(f"DEBUG: Removing stale database entry: {db_entry}")
-                auth_db.delete_manga_entry(user_id, db_entry)
-        
+        stale_entries = [e for e in all_db_entries if e not in found_manga_paths]
+        if stale_entries:
+            logger.debug("Removing %d stale database entries", len(stale_entries))
+            auth_db.delete_manga_entries_bulk(user_id, stale_entries)
+
     except Exception as e:
-        print(f"Error scanning manga library: {str(e)}")
+        logger.error("Error scanning manga library: %s", e)
 
 @app.route('/api/libraries/manga', methods=['DELETE'])
 @token_required
@@ -369,20 +613,27 @@ def delete_manga():
             return jsonify({'message': 'manga path required'}), 400
         
         # Security check: ensure the path is within user's media paths
-        media_paths = auth_db.get_media_paths(request.user_id)
+        # (commonpath rather than startswith so /foo/barbaz can't pass as
+        # being inside /foo/bar)
+        library_map = _get_library_map(request.user_id)
+        real_manga_path = os.path.realpath(manga_path)
         is_allowed = False
-        
-        for path_info in media_paths:
-            if manga_path.startswith(path_info['media_path']):
-                is_allowed = True
-                break
-        
+        for media_path in library_map.values():
+            real_media = os.path.realpath(media_path)
+            try:
+                if os.path.commonpath([real_manga_path, real_media]) == real_media:
+                    is_allowed = True
+                    break
+            except ValueError:
+                continue
+
         if not is_allowed:
             return jsonify({'message': 'Access denied'}), 403
         
         # Delete from database first
         deleted_from_db = auth_db.delete_manga_entry(request.user_id, manga_path)
-        print(f"DEBUG: Deleted from database: {deleted_from_db} for path: {manga_path}")
+        _invalidate_library_response(request.user_id)
+        logger.debug("Deleted from database: %s for path: %s", deleted_from_db, manga_path)
         
         # Then delete from file system
         if os.path.exists(manga_path) and os.path.isdir(manga_path):
@@ -393,6 +644,24 @@ def delete_manga():
     except Exception as e:
         return jsonify({'message': f'Error deleting manga: {str(e)}'}), 500
 
+def _collect_manga_dirs(media_path):
+    """List top-level manga directories under a media path"""
+    to_delete = []
+    for root, files in _iter_manga_dirs(media_path):
+        if root == media_path:
+            continue
+        if any(os.path.splitext(f)[1].lower() in MANGA_FILE_EXTS for f in files):
+            to_delete.append(root)
+    return to_delete
+
+def _rmtree_parallel(paths):
+    """Delete directory trees concurrently; rmtree walks overlap well on
+    SSDs and networked filesystems"""
+    if not paths:
+        return
+    with ThreadPoolExecutor(max_workers=min(8, len(paths))) as ex:
+        list(ex.map(lambda p: shutil.rmtree(p, ignore_errors=True), paths))
+
 @app.route('/api/libraries/manga/all', methods=['DELETE'])
 @token_required
 def delete_all_manga():
@@ -400,26 +669,22 @@ def delete_all_manga():
     try:
         # Delete all entries from database first
         deleted_from_db = auth_db.delete_all_manga_entries(request.user_id)
+        _invalidate_library_response(request.user_id)
         
         media_paths = auth_db.get_media_paths(request.user_id)
-        deleted_count = 0
-        
+        to_delete = []
+
         for path_info in media_paths:
             media_path = path_info['media_path']
             if not os.path.exists(media_path):
                 continue
-            
-            # Walk through and delete all manga directories
-            for root, dirs, files in os.walk(media_path):
-                # Only delete top-level manga directories
-                depth = root.replace(media_path, '').count(os.sep)
-                if depth == 1:  # Top-level manga folder
-                    manga_files = [f for f in files if f.lower().endswith(('.cbz', '.cbr', '.pdf', '.epub'))]
-                    if manga_files:
-                        shutil.rmtree(root)
-                        deleted_count += 1
-        
-        return jsonify({'message': f'All manga deleted successfully', 'deleted_count': deleted_count, 'deleted_from_db': deleted_from_db}), 200
+
+            # Collect all top-level manga directories
+            to_delete.extend(_collect_manga_dirs(media_path))
+
+        _rmtree_parallel(to_delete)
+
+        return jsonify({'message': f'All manga deleted successfully', 'deleted_count': len(to_delete), 'deleted_from_db': deleted_from_db}), 200
     except Exception as e:
         return jsonify({'message': f'Error deleting all manga: {str(e)}'}), 500
 
@@ -429,33 +694,22 @@ def delete_library_manga(library_name):
     """Delete all manga from a specific library"""
     try:
         # Get the media path for this library
-        media_paths = auth_db.get_media_paths(request.user_id)
-        library_path = None
-        
-        for path_info in media_paths:
-            if path_info['path_name'] == library_name:
-                library_path = path_info['media_path']
-                break
-        
+        library_path = _get_library_map(request.user_id).get(library_name)
+
         if not library_path:
             return jsonify({'message': f'Library "{library_name}" not found'}), 404
         
         # Delete entries from database for this library
         deleted_from_db = auth_db.delete_manga_entries_by_library(request.user_id, library_path)
+        _invalidate_library_response(request.user_id)
         
-        deleted_count = 0
+        to_delete = []
         if os.path.exists(library_path):
-            # Walk through and delete all manga directories in this library
-            for root, dirs, files in os.walk(library_path):
-                # Only delete top-level manga directories
-                depth = root.replace(library_path, '').count(os.sep)
-                if depth == 1:  # Top-level manga folder
-                    manga_files = [f for f in files if f.lower().endswith(('.cbz', '.cbr', '.pdf', '.epub'))]
-                    if manga_files:
-                        shutil.rmtree(root)
-                        deleted_count += 1
-        
-        return jsonify({'message': f'All manga in library "{library_name}" deleted successfully', 'deleted_count': deleted_count, 'deleted_from_db': deleted_from_db}), 200
+            # Delete all top-level manga directories in this library
+            to_delete = _collect_manga_dirs(library_path)
+        _rmtree_parallel(to_delete)
+
+        return jsonify({'message': f'All manga in library "{library_name}" deleted successfully', 'deleted_count': len(to_delete), 'deleted_from_db': deleted_from_db}), 200
     except Exception as e:
         return jsonify({'message': f'Error deleting manga from library "{library_name}": {str(e)}'}), 500
 
@@ -470,7 +724,9 @@ def delete_all_libraries():
         for path_info in media_paths:
             auth_db.delete_media_path(request.user_id, path_info['path_name'])
             deleted_count += 1
-        
+
+        _invalidate_library_map(request.user_id)
+        _invalidate_library_response(request.user_id)
         return jsonify({'message': 'All libraries deleted successfully', 'deleted_count': deleted_count}), 200
     except Exception as e:
         return jsonify({'message': f'Error deleting all libraries: {str(e)}'}), 500
@@ -480,19 +736,15 @@ def delete_all_libraries():
 @token_required
 def api_logout():
     """Logout API endpoint"""
-    token = None
-    
     # Get token from Authorization header
-    if 'Authorization' in request.headers:
-        auth_header = request.headers['Authorization']
-        try:
-            token = auth_header.split(' ')[1]
-        except IndexError:
-            return jsonify({'message': 'Invalid token format'}), 401
-    
+    auth_header = request.headers.get('Authorization')
+    token = _extract_bearer(auth_header)
+    if auth_header and not token:
+        return jsonify({'message': 'Invalid token format'}), 401
+
     if token:
         auth_db.invalidate_session(token)
-    
+
     return jsonify({'message': 'Logged out successfully'}), 200
 
 @app.route('/api/auth/paths', methods=['GET'])
@@ -513,11 +765,9 @@ def browse_directories():
     path = data.get('path', default_path)
     
     try:
-        dirs = []
-        for item in os.listdir(path):
-            item_path = os.path.join(path, item)
-            if os.path.isdir(item_path):
-                dirs.append(item_path)
+        # scandir reuses the dirent type info, so no per-entry stat
+        with os.scandir(path) as it:
+            dirs = [entry.path for entry in it if entry.is_dir(follow_symlinks=False)]
         dirs.sort()
         return jsonify({'directories': dirs[:20]}), 200  # Limit to 20 results
     except Exception as e:
@@ -526,7 +776,6 @@ def browse_directories():
 @app.route('/favicon.ico')
 def favicon():
     """Serve favicon"""
-    from flask import send_from_directory
     return send_from_directory(os.path.join(app.root_path, 'static'),
                                'favicon.svg', mimetype='image/svg+xml')
 
@@ -561,9 +810,8 @@ def delete_download(download_id):
     
     try:
         # First, get the download details to know what files to remove
-        downloads = auth_db.get_user_downloads(user_id)
-        download = next((d for d in downloads if d['id'] == download_id), None)
-        
+        download = auth_db.get_download(download_id, user_id)
+
         if not download:
             return jsonify({'error': 'Download not found'}), 404
         
@@ -574,7 +822,13 @@ def delete_download(download_id):
                 'error': 'Download cancelled by user'
             })
             
-            # Also update the in-memory entry to signal cancellation to the background thread
+            # Signal the background thread through its in-memory flag
+            with _cancel_events_lock:
+                cancel_event = _cancel_events.get(download_id)
+            if cancel_event:
+                cancel_event.set()
+
+            # Also update the in-memory entry so status polling reflects it
             global youtube_downloads
             for yt_download in youtube_downloads:
                 if yt_download.get('db_id') == download_id:
@@ -584,7 +838,6 @@ def delete_download(download_id):
             
             print(f"✗ Download cancelled: {download.get('title', 'Unknown')}")
             # Give thread a moment to see the cancellation
-            import time
             time.sleep(0.1)
         
         # Remove files from filesystem if they exist
@@ -608,17 +861,24 @@ def delete_download(download_id):
                     manga_title = download.get('title', '')
                     if manga_title and os.path.isdir(temp_path):
                         # Look for directories that might contain the manga
-                        for item in os.listdir(temp_path):
-                            item_path = os.path.join(temp_path, item)
-                            if os.path.isdir(item_path) and (manga_title.lower() in item.lower() or item.lower() in manga_title.lower()):
-                                try:
-                                    shutil.rmtree(item_path)
-                                    files_removed.append(f"Cancelled manga directory: {item_path}")
-                                    print(f"🗑️ Removed cancelled manga directory: {item_path}")
-                                except Exception as e:
-                                    error_msg = f"Failed to remove cancelled manga directory {item_path}: {e}"
+                        # (scandir avoids a stat per entry; lowercase once)
+                        title_l = manga_title.lower()
+                        with os.scandir(temp_path) as it:
+                            for item in it:
+                                if not item.is_dir(follow_symlinks=False):
+                                    continue
+                                name_l = item.name.lower()
+                                if title_l not in name_l and name_l not in title_l:
+                                    continue
+                                rmtree_errors = []
+                                shutil.rmtree(item.path, onerror=lambda fn, p, exc: rmtree_errors.append(p))
+                                if rmtree_errors:
+                                    error_msg = f"Failed to remove cancelled manga directory {item.path} ({len(rmtree_errors)} path(s) left)"
                                     errors.append(error_msg)
                                     print(f"⚠️ {error_msg}")
+                                else:
+                                    files_removed.append(f"Cancelled manga directory: {item.path}")
+                                    print(f"🗑️ Removed cancelled manga directory: {item.path}")
             else:
                 try:
                     if os.path.isdir(temp_path):
@@ -662,28 +922,25 @@ def api_browse_directories():
     if not current_path:
         # Return common starting paths
         if os.name == 'nt':  # Windows
+            # One syscall for the whole drive map; probing each letter with
+            # exists/listdir can block for seconds on disconnected network
+            # or optical drives
             drives = []
-            import string
-            for drive in string.ascii_uppercase:
-                drive_path = f"{drive}:\\"
-                if os.path.exists(drive_path):
-                    try:
-                        # Check if drive is accessible
-                        os.listdir(drive_path)
-                        drives.append({
-                            'name': drive_path,
-                            'path': drive_path,
-                            'is_dir': True,
-                            'display': f"{drive}: Drive"
-                        })
-                    except (PermissionError, OSError):
-                        pass
+            mask = ctypes.windll.kernel32.GetLogicalDrives()
+            for i, drive in enumerate(string.ascii_uppercase):
+                if mask & (1 << i):
+                    drive_path = f"{drive}:\\"
+                    drives.append({
+                        'name': drive_path,
+                        'path': drive_path,
+                        'is_dir': True,
+                        'display': f"{drive}: Drive"
+                    })
             return jsonify({'directories': drives, 'current': None, 'breadcrumb': []})
         else:  # Linux/Mac
             # Return root filesystem and common user directories
             paths = []
-            root_paths = ['/', '/home', '/usr', '/var', '/opt']
-            for root_path in root_paths:
+            for root_path in BROWSE_ROOT_PATHS:
                 if os.path.exists(root_path):
                     try:
                         os.listdir(root_path)
@@ -725,18 +982,19 @@ def api_browse_directories():
         # Filter out empty parts (from leading /)
         parts = [p for p in parts if p]
         
+        # Accumulate the path as we go instead of re-joining the full
+        # prefix for every crumb (O(n) string work for deep paths)
+        acc = '' if os.name == 'nt' else os.sep
         for i, part in enumerate(parts):
             if os.name == 'nt' and i == 0:
                 # Windows drive like "C:"
-                path = part + os.sep
+                acc = part + os.sep
             else:
-                path = os.sep + os.sep.join(parts[:i+1]) if i == 0 and not os.name == 'nt' else os.sep.join(parts[:i+1])
-            
-            if path:
-                breadcrumb.append({
-                    'name': part,
-                    'path': path
-                })
+                acc = os.path.join(acc, part)
+            breadcrumb.append({
+                'name': part,
+                'path': acc
+            })
         
         # Get parent directory
         parent = os.path.dirname(current_path)
@@ -752,22 +1010,25 @@ def api_browse_directories():
         # Get subdirectories
         directories = []
         try:
-            entries = os.listdir(current_path)
-            for entry in sorted(entries, key=str.lower):
-                full_path = os.path.join(current_path, entry)
-                try:
-                    if os.path.isdir(full_path):
-                        # Skip hidden directories on Unix
-                        if os.name != 'nt' and entry.startswith('.'):
+            # scandir's is_dir uses the type info already fetched with the
+            # listing, so this avoids a stat syscall per entry
+            with os.scandir(current_path) as it:
+                for entry in it:
+                    try:
+                        if not entry.is_dir(follow_symlinks=False):
                             continue
-                        directories.append({
-                            'name': entry,
-                            'path': full_path,
-                            'is_dir': True
-                        })
-                except (PermissionError, OSError):
-                    # Skip directories we can't access
-                    continue
+                    except OSError:
+                        # Skip entries we can't access
+                        continue
+                    # Skip hidden directories on Unix
+                    if os.name != 'nt' and entry.name.startswith('.'):
+                        continue
+                    directories.append({
+                        'name': entry.name,
+                        'path': entry.path,
+                        'is_dir': True
+                    })
+            directories.sort(key=lambda d: d['name'].lower())
         except (PermissionError, OSError) as e:
             return jsonify({'error': f'Cannot read directory: {str(e)}'}), 400
         
@@ -829,21 +1090,44 @@ def get_downloads():
     })
 
 
+# Anti-detection headers shared by every yt-dlp call, built once at import
+# instead of per request
+_YTDLP_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+_YTDLP_HTTP_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Cache-Control': 'max-age=0',
+}
+
+# Bounded worker pool for downloads: N simultaneous requests queue up
+# instead of spawning N threads that thrash the disk and the origin
+_MAX_CONCURRENT_DOWNLOADS = int(os.environ.get('NUKEDOWN_MAX_DOWNLOADS', '4'))
+_download_executor = ThreadPoolExecutor(max_workers=_MAX_CONCURRENT_DOWNLOADS,
+                                        thread_name_prefix='yt-download')
+
 @app.route('/api/youtube_download', methods=['POST'])
 @token_required
 def youtube_download():
     """Download a YouTube video"""
-    print("YouTube download request received")
     data = request.get_json()
-    print(f"Request data: {data}")
+    # Lazy %-formatting: the repr of the payload is never built unless
+    # debug logging is actually enabled
+    logger.debug("YouTube download request received: %r", data)
     url = data.get('url')
     destination_path = data.get('destination_path')
-    print(f"URL: {url}, Destination: {destination_path}")
     if not url:
-        print("No URL provided")
+        logger.debug("No URL provided")
         return jsonify({'error': 'URL required'}), 400
     if not destination_path:
-        print("No destination path provided")
+        logger.debug("No destination path provided")
         return jsonify({'error': 'Destination path required'}), 400
     
     # Capture user_id from request context before starting thread
@@ -876,8 +1160,8 @@ def youtube_download():
             'audio_only': audio_only,
             'source': 'YouTube',
             'destination': youtube_dir,
-            'added_at': datetime.now().isoformat(),
-            'created_at': datetime.now().isoformat(),
+            'added_at': _now_iso(),
+            'created_at': _now_iso(),
         }
         youtube_downloads.append(download_entry)
         
@@ -903,35 +1187,33 @@ def youtube_download():
             
             # Update the in-memory entry with the database ID
             download_entry['db_id'] = db_download_id
-            
+
+            # Register a cancellation flag so delete_download can signal us
+            # without either side polling the database
+            cancel_event = threading.Event()
+            with _cancel_events_lock:
+                _cancel_events[db_download_id] = cancel_event
+
+
+            # Check for the cookie file once; both option dicts reuse it
+            cookie_file = os.path.join(os.path.dirname(__file__), 'config', 'youtube_cookies.txt')
+            if not os.path.exists(cookie_file):
+                cookie_file = None
+
             # Get video info to determine if it's a playlist
             info_opts = {
-                'quiet': True, 
+                'quiet': True,
                 'no_warnings': True,
                 # Anti-detection measures for info extraction
-                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'http_headers': {
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Sec-Fetch-User': '?1',
-                    'Cache-Control': 'max-age=0',
-                },
+                'user_agent': _YTDLP_USER_AGENT,
+                'http_headers': _YTDLP_HTTP_HEADERS,
                 'sleep_interval': 1,
                 'max_sleep_interval': 3,
             }
             
-            # Add cookie file if it exists
-            cookie_file = os.path.join(os.path.dirname(__file__), 'config', 'youtube_cookies.txt')
-            if os.path.exists(cookie_file):
+            if cookie_file:
                 info_opts['cookiefile'] = cookie_file
-            
+
             try:
                 with yt_dlp.YoutubeDL(info_opts) as ydl:
                     info = ydl.extract_info(url, download=False)
@@ -962,10 +1244,14 @@ def youtube_download():
                     'title': download_entry['title']
                 })
             
-            # Progress hook function
+            # Progress hook function; coalesces database writes so a long
+            # download doesn't commit on every callback
+            progress_state = {'last_percent': -1, 'last_write': 0.0}
+
             def progress_hook(d):
-                # Check if download has been cancelled
-                if download_entry.get('status') == 'cancelled':
+                # Check if download has been cancelled (lock-free in-memory
+                # flag set by delete_download)
+                if cancel_event.is_set():
                     print(f"🛑 Download cancelled by user: {download_entry.get('title', 'Unknown')}")
                     # Raise exception to stop yt-dlp
                     raise Exception("Download cancelled by user")
@@ -977,8 +1263,15 @@ def youtube_download():
                         if total > 0:
                             progress = int((downloaded / total) * 100)
                             download_entry['progress'] = progress
-                            # Update progress in database
-                            if 'db_id' in download_entry:
+                            # Write to the database only on whole-percent
+                            # changes, at most once a second (the final 100%
+                            # is written unconditionally on finish)
+                            now = time.monotonic()
+                            if ('db_id' in download_entry
+                                    and progress != progress_state['last_percent']
+                                    and now - progress_state['last_write'] > 1.0):
+                                progress_state['last_percent'] = progress
+                                progress_state['last_write'] = now
                                 auth_db.update_download(download_entry['db_id'], user_id, {
                                     'progress': progress
                                 })
@@ -989,34 +1282,35 @@ def youtube_download():
                     if is_playlist and 'filename' in d:
                         # Get the video filename that just finished
                         finished_file = d['filename']
-                        if os.path.exists(finished_file):
-                            try:
-                                # Find the relative path from temp_dir
-                                rel_path = os.path.relpath(finished_file, temp_dir)
-                                dst = os.path.join(youtube_dir, rel_path)
-                                
-                                # Create destination directory
-                                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                                
-                                # Move the file
-                                shutil.move(finished_file, dst)
-                                print(f"✓ Moved completed video: {os.path.basename(finished_file)}")
-                                
-                                # Also move any related files (thumbnail, info.json, etc.)
-                                finished_dir = os.path.dirname(finished_file)
-                                video_basename = os.path.splitext(os.path.basename(finished_file))[0]
-                                
-                                for file in os.listdir(finished_dir):
-                                    if file.startswith(video_basename) and file != os.path.basename(finished_file):
-                                        src_related = os.path.join(finished_dir, file)
-                                        dst_related = os.path.join(os.path.dirname(dst), file)
-                                        try:
-                                            shutil.move(src_related, dst_related)
-                                            print(f"✓ Moved related file: {file}")
-                                        except Exception as e:
-                                            print(f"⚠️ Failed to move related file {file}: {e}")
-                            except Exception as e:
-                                print(f"⚠️ Failed to move completed video {finished_file}: {e}")
+                        # EAFP: the move raises if the file vanished, so no
+                        # pre-flight exists() stat
+                        try:
+                            # Find the relative path from temp_dir
+                            rel_path = os.path.relpath(finished_file, temp_dir)
+                            dst = os.path.join(youtube_dir, rel_path)
+
+                            # Create destination directory
+                            os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+                            # Move the file
+                            _move_fast(finished_file, dst)
+                            logger.debug("Moved completed video: %s", os.path.basename(finished_file))
+
+                            # Also move any related files (thumbnail, info.json, etc.)
+                            finished_dir = os.path.dirname(finished_file)
+                            video_basename = os.path.splitext(os.path.basename(finished_file))[0]
+
+                            for file in os.listdir(finished_dir):
+                                if file.startswith(video_basename) and file != os.path.basename(finished_file):
+                                    src_related = os.path.join(finished_dir, file)
+                                    dst_related = os.path.join(os.path.dirname(dst), file)
+                                    try:
+                                        _move_fast(src_related, dst_related)
+                                        logger.debug("Moved related file: %s", file)
+                                    except Exception as e:
+                                        logger.warning("Failed to move related file %s: %s", file, e)
+                        except Exception as e:
+                            logger.warning("Failed to move completed video %s: %s", finished_file, e)
                     
                     download_entry['progress'] = 100
                     # Update progress in database
@@ -1027,27 +1321,13 @@ def youtube_download():
             
             # Base options for all downloads
             base_opts = {
-                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'http_headers': {
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Sec-Fetch-User': '?1',
-                    'Cache-Control': 'max-age=0',
-                },
+                'user_agent': _YTDLP_USER_AGENT,
+                'http_headers': _YTDLP_HTTP_HEADERS,
                 'sleep_interval': 1,
                 'max_sleep_interval': 5,
             }
             
-            # Add cookie file if it exists
-            cookie_file = os.path.join(os.path.dirname(__file__), 'config', 'youtube_cookies.txt')
-            if os.path.exists(cookie_file):
+            if cookie_file:
                 base_opts['cookiefile'] = cookie_file
             
             if audio_only:
@@ -1132,27 +1412,27 @@ def youtube_download():
                             rel_path = os.path.relpath(src, temp_dir)
                             dst = os.path.join(youtube_dir, rel_path)
                             os.makedirs(os.path.dirname(dst), exist_ok=True)
-                            shutil.move(src, dst)
+                            _move_fast(src, dst)
                             files_moved.append(rel_path)
                         except Exception as e:
-                            print(f"⚠️ Failed to move file {file}: {e}")
+                            logger.warning("Failed to move file %s: %s", file, e)
                 
                 if files_moved:
-                    print(f"✓ Moved {len(files_moved)} remaining files to destination")
+                    logger.debug("Moved %d remaining files to destination", len(files_moved))
             except Exception as e:
-                print(f"⚠️ Error during final file moving: {e}")
+                logger.warning("Error during final file moving: %s", e)
             
             # Clean up temp directory
             try:
                 shutil.rmtree(temp_dir)
-                print("✓ Cleaned up temporary directory")
+                logger.debug("Cleaned up temporary directory")
             except Exception as e:
-                print(f"⚠️ Failed to clean up temp directory {temp_dir}: {e}")
+                logger.warning("Failed to clean up temp directory %s: %s", temp_dir, e)
             
             # Mark as completed
             download_entry['status'] = 'completed'
             download_entry['progress'] = 100
-            download_entry['completed_at'] = datetime.now().isoformat()
+            download_entry['completed_at'] = _now_iso()
             
             # Update database with completion
             if 'db_id' in download_entry:
@@ -1184,18 +1464,25 @@ def youtube_download():
                         'status': 'failed',
                         'error': str(e)
                     })
-    
-    thread = threading.Thread(target=download_video, args=(user_id,))
-    thread.daemon = True
-    thread.start()
-    print("Download thread started")
-    
+        finally:
+            if 'db_id' in download_entry:
+                with _cancel_events_lock:
+                    _cancel_events.pop(download_entry['db_id'], None)
+
+    _download_executor.submit(download_video, user_id)
+    logger.debug("Download queued")
+
     return jsonify({'success': True, 'message': 'Download started'}), 200
 
 
-if __name__ == '__main__':
+def main():
+    """Run the development server; WSGI deployments import app directly"""
     port = int(os.environ.get('PORT', 5100))
     debug = os.environ.get('FLASK_ENV') != 'production'
     print(f"Starting nukedown ({'Production' if not debug else 'Development'}) on http://localhost:{port}")
     print("Access the web interface to request manga downloads")
     app.run(host='0.0.0.0', port=port, debug=debug)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,10 @@
-import hashlib
 import sqlite3
 
-def hash_password(password):
-    """Hash password using SHA256 (same as auth.py)"""
-    return hashlib.sha256(password.encode()).hexdigest()
+from auth import AuthDB
 
 def reset_password(username, new_password):
     """Reset password for user"""
-    hashed = hash_password(new_password)
+    hashed = AuthDB._hash_password(new_password)
 
     conn = sqlite3.connect('config/nukedown.db')
     c = conn.cursor()
@@ -22,4 +19,4 @@ reset_password('root', 'admin123')
 
 print("\nNow you can login with:")
 print("Username: root")
-print("Password: admin123")
\ No newline at end of file
+print("Password: admin123")